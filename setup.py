@@ -9,7 +9,7 @@ setuptools.setup(
     long_description="",
     package_dir={"": "src"},
     packages=["cfsroutes"],
-    install_requires=["requests", "ortools", "numpy"],
+    install_requires=["requests", "ortools", "numpy", "scipy"],
     python_requires=">=3.8",
     classifiers=["Programming Language :: Python :: 3", "Operating System :: OS Independent"],
     entry_points={"console_scripts": ["cfsroutes=cfsroutes.routes:cli"]},
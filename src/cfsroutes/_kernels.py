@@ -0,0 +1,32 @@
+"""Numba-compiled distance kernels.
+
+Importing this module requires the optional numba package; `matrix` falls
+back to the NumPy broadcast path when it is unavailable.
+"""
+import numpy as np
+from numba import njit, prange
+
+R = 6378137 # Approximate radius of the earth
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def haversine_matrix(lat, lng, out):
+    """Fill `out[i, j]` with pairwise haversine distances in one fused pass.
+
+    `lat` and `lng` are radians. The fused loop allocates no N^2
+    temporaries and parallelizes the outer index across cores.
+    """
+    n = lat.shape[0]
+    for i in prange(n):
+        cos_lat_i = np.cos(lat[i])
+        for j in range(n):
+            a = (
+                np.sin((lat[j] - lat[i]) * 0.5)**2
+                + cos_lat_i * np.cos(lat[j]) * np.sin((lng[j] - lng[i]) * 0.5)**2
+            )
+            out[i, j] = 2 * R * np.arcsin(np.sqrt(a))
+
+
+# Warm up the JIT at import so compilation cost isn't paid on the first request.
+_warm = np.zeros(2, dtype=np.float64)
+haversine_matrix(_warm, _warm, np.zeros((2, 2), dtype=np.float64))
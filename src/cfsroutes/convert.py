@@ -1,20 +1,28 @@
 """Functions for preprocessing and checking that given addresses can be parsed sensibly."""
 from . import matrix
 from . import values
+from . import geocache
 from . import client as gm_client
 
 import re
 import csv
 import json
+import operator
 import requests
+from requests.adapters import HTTPAdapter, Retry
 import functools
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Tuple
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_WHITESPACE_RE = re.compile(r"\s+")
+_UNIT_RE = re.compile(r"^(#?[0-9]+)\s*\-+\s*(.*)")
+
+_PANDAS_CSV_BYTES = 1 << 20 # Files at least this large use pandas when available
+
 
 def load_json(infile):
     if not isinstance(infile, Path):
@@ -33,6 +41,7 @@ class BaseConfig():
         "csv_keys": None,
         "slips_header": "",
         "geocoding_service": "bcgov",
+        "geocache_path": None, # Default location; False disables the persistent cache
         "enable_filter": True,
         "drivers": None, 
     }
@@ -40,6 +49,7 @@ class BaseConfig():
     def __init__(self, config=None):
         self.config = self.init_config(config)
         self.city = self.config.get("city")
+        self._city_lower = self.city.lower()
         self.origin = self.config.get("origin", self.city)
         self.csv_keys = self.config.get("csv_keys")
         self.slips_header = self.config.get("slips_header", self.csv_keys)
@@ -73,6 +83,16 @@ class Converter(BaseConfig):
 
     def __init__(self, config=None, signup=None):
         super().__init__(config=config)
+        self._geocache = geocache.init_cache(self.config.get("geocache_path"))
+        # Shared session: keep-alive skips repeated TLS handshakes and the
+        # pool covers all thread-pool workers; retry with backoff on rate limits.
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=20,
+            pool_maxsize=20,
+            max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504]),
+        )
+        self._session.mount("https://", adapter)
         self.data = []
         self.filtered = []
     
@@ -89,22 +109,34 @@ class Converter(BaseConfig):
 
 
     def preprocess_address(self, address):
-        """Strip multiline addresses and unit numbers."""
-        address = address.strip().replace("\n", ", ").replace("/", "-")
+        """Normalize an address for lookup and cache keying.
+
+        Strips case and extra whitespace, drops unit numbers, and appends
+        the configured city, so equivalent spellings of the same address
+        produce one canonical form and share one cache entry.
+        """
+        address = address.strip().lower().replace("\n", ", ").replace("/", "-")
+        address = _WHITESPACE_RE.sub(" ", address)
+        address = address.rstrip(".,;")
         address = address[:50]
         # Attempt to remove unit numbers
-        address = re.sub(r"^(#?[0-9]+)\s*\-+\s*(.*)", r"\2", address)
-        if self.city.lower() not in address.lower():
-            address = f"{address}, {self.city}"
+        address = _UNIT_RE.sub(r"\2", address)
+        if self._city_lower not in address:
+            address = f"{address}, {self._city_lower}"
         return address
 
 
-    @functools.cache
     def gm_get_location(self, address):
         """Use google geocoding api to get coordinates and parsed address."""
+        return self._gm_geocode_normalized(self.preprocess_address(address))
+
+
+    @functools.cache
+    @geocache.cached("google")
+    def _gm_geocode_normalized(self, address):
+        """Google lookup for a normalized address; cached on the canonical form."""
         client = gm_client.get_client()
-        address = self.preprocess_address(address) + ", BC"
-        result = client.geocode(address)
+        result = client.geocode(address + ", BC")
         if not result:
             logger.warning('No result for address "%s".', address)
             return {"location": None}
@@ -116,15 +148,15 @@ class Converter(BaseConfig):
         for component in result.get("address_components"):
             types = component.get("types")
             if "street_number" in types:
-                street += [component["long_name"]]
+                street.append(component["long_name"])
             elif "route" in types:
-                street += [component["long_name"]]
+                street.append(component["long_name"])
             elif "locality" in types:
-                city += [component["long_name"]]
+                city.append(component["long_name"])
             elif "administrative_area_level_1" in types:
-                city += [component["long_name"]]
+                city.append(component["long_name"])
             elif "country" in types:
-                city += [component["long_name"]]
+                city.append(component["long_name"])
             elif "postal_code" in types:
                 postal = component["long_name"]
         city = ", ".join(city)
@@ -137,16 +169,21 @@ class Converter(BaseConfig):
         return data
 
 
-    @functools.cache
     def bcgov_get_location(self, address):
         """Geocoding function using the BC Government address api.
 
         See https://github.com/bcgov/ols-geocoder
         """
-        address = self.preprocess_address(address)
+        return self._bcgov_geocode_normalized(self.preprocess_address(address))
+
+
+    @functools.cache
+    @geocache.cached("bcgov")
+    def _bcgov_geocode_normalized(self, address):
+        """BC-gov lookup for a normalized address; cached on the canonical form."""
         payload = {"addressString": address, "maxResults": 1}
         service_url = f"https://geocoder.api.gov.bc.ca/addresses.json"
-        response = requests.get(service_url, params=payload)
+        response = self._session.get(service_url, params=payload, timeout=10)
         try:
             features = response.json()["features"][0]
             lng, lat = features["geometry"]["coordinates"]
@@ -165,17 +202,31 @@ class Converter(BaseConfig):
 
 
     def add_coordinates(self, data):
-        """Mutate data to add coordinates for addresses."""
+        """Mutate data to add coordinates for addresses.
+
+        Geocoding is network-bound, so the lookups are issued concurrently.
+        Addresses are deduplicated before dispatch — concurrent submission
+        would miss the still-cold in-memory cache — then the per-address
+        results are fanned back out to the rows.
+        """
+        pending = [row for row in data if not row.get("location")]
+        if pending:
+            addresses = list(dict.fromkeys(row["address"] for row in pending))
+            # Google documents tighter rate limits than the BC-gov endpoint
+            max_workers = 10 if self.config.get("geocoding_service") == "google" else 20
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = dict(zip(addresses, executor.map(self.geocoding_func, addresses)))
+            for row in pending:
+                location_data = results[row["address"]]
+                if location_data:
+                    row.update(location_data)
+                else:
+                    source_index = row.get("source_index")
+                    logger.warning('%2d| No coordinates found for "%s".', source_index, row["address"])
         for row in data:
-            if row.get("location"):
-                continue # Has coordinates
-            address = row["address"]
-            location_data = self.geocoding_func(address)
-            if location_data:
-                row.update(location_data)
-            else:
-                source_index = row.get("source_index")
-                logger.warning('%2d| No coordinates found for "%s".', source_index, address)
+            if row.get("location") and "_xyz" not in row:
+                # Cache the Cartesian triple so distance checks skip per-pair trig
+                row["_xyz"] = matrix.cartesian(row["location"])
 
 
     def add_location_from_postal(self, row):
@@ -183,6 +234,7 @@ class Converter(BaseConfig):
         postal = row.get("postal", "")[:3].upper()
         fallback_location = values.postal_code_fallback.get(postal, values.default_location)
         row["location"] = fallback_location
+        row["_xyz"] = matrix.cartesian(fallback_location)
 
 
     def check_coordinates(self, data, threshold=10000) -> Tuple[list, list]:
@@ -204,17 +256,18 @@ class Converter(BaseConfig):
             full_address = row.get("full_address")
             if full_address in ("Victoria, BC", "BC"):
                 logger.warning("%2d| %s. Failed to parse.", row.get("source_index"), address)
-            distance = matrix.distance(location, origin) if location else None
-            logger.info("%2d| %s, distance=%sm", row.get("source_index"), address, int(distance))
-            logger.info("  > %s", full_address)
+            distance = matrix.distance(row, origin_data) if location else None
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("%2d| %s, distance=%sm", row.get("source_index"), address, int(distance))
+                logger.debug("  > %s", full_address)
             if distance is None or distance > threshold:
                 logger.warning("%2d| %s. Distance %s exceeds %s", row.get("source_index"), address, int(distance), threshold)
                 if self.enable_filter:
-                    filtered += [row]
+                    filtered.append(row)
                     continue
                 else:
                     self.add_location_from_postal(row)
-            keep += [row]
+            keep.append(row)
         return keep, filtered
 
 
@@ -235,19 +288,55 @@ class Converter(BaseConfig):
         return result_dict
 
 
+    def _from_csv_pandas(self, pd, csv_file: Path) -> list:
+        """Bulk csv path for large inputs: parse and strip whole columns in C."""
+        with csv_file.open("r") as f:
+            title_row = next(csv.reader(f))
+        index = self.column_name_to_index(title_row)
+        keys = tuple(self.csv_keys)
+        columns = [index[key] for key in keys]
+        frame = pd.read_csv(
+            csv_file,
+            skiprows=1,
+            header=None,
+            usecols=columns,
+            dtype=str,
+            keep_default_na=False,
+        )
+        stripped = [frame[column].str.strip() for column in columns]
+        data = []
+        for i, row_values in enumerate(zip(*stripped), start=1):
+            row_data = dict(zip(keys, row_values))
+            row_data["source_index"] = i
+            data.append(row_data)
+        return data
+
+
     def from_csv(self, csv_file: Path) -> list:
         """Convert rows from csv input into dictionaries of required values."""
+        if csv_file.stat().st_size >= _PANDAS_CSV_BYTES:
+            try:
+                import pandas as pd
+            except ImportError: # pandas is an optional dependency
+                pd = None
+            if pd is not None:
+                return self._from_csv_pandas(pd, csv_file)
         data = []
         with csv_file.open("r") as f:
             reader = csv.reader(f)
             title_row = next(reader)
             index = self.column_name_to_index(title_row)
-            for i, row in enumerate(reader):
-                i += 1 
-                row_data = {key: row[index[key]].strip() for key in self.csv_keys}
+            keys = tuple(self.csv_keys)
+            # Resolve column positions once instead of per-row dict lookups
+            getter = operator.itemgetter(*[index[key] for key in keys])
+            if len(keys) == 1: # itemgetter returns a bare value for one key
+                single_getter = getter
+                getter = lambda row: (single_getter(row),)
+            for i, row in enumerate(reader, start=1):
+                row_data = dict(zip(keys, (value.strip() for value in getter(row))))
                 row_data["source_index"] = i
                 logger.debug("%2d| %s", i, row_data)
-                data += [row_data]
+                data.append(row_data)
         return data
 
 
@@ -292,7 +381,7 @@ class Converter(BaseConfig):
                 lines = f.read().splitlines()
             for line in lines:
                 driver, postal_code = line.split(',')
-                driver_locations += [{"name": driver, "postal": postal_code}]
+                driver_locations.append({"name": driver, "postal": postal_code})
 
         return driver_locations
 
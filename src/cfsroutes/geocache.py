@@ -0,0 +1,83 @@
+"""Persistent on-disk cache for geocoding results.
+
+Results are stored in a small sqlite database keyed on the geocoding
+service and the preprocessed address, so repeat runs skip the network
+entirely for addresses already seen.
+"""
+import json
+import sqlite3
+import functools
+import threading
+from pathlib import Path
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = Path.home() / ".cache" / "cfsroutes" / "geocode.sqlite"
+
+
+class GeoCache:
+    """Sqlite-backed mapping of `(service, address)` to geocoding results."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS geocode"
+            " (service TEXT, address TEXT, result TEXT, PRIMARY KEY (service, address))"
+        )
+        self._connection.commit()
+
+    def get(self, service, address):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT result FROM geocode WHERE service = ? AND address = ?",
+                (service, address),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def set(self, service, address, result):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO geocode VALUES (?, ?, ?)",
+                (service, address, json.dumps(result)),
+            )
+            self._connection.commit()
+
+
+def init_cache(path=None):
+    """Return a GeoCache at `path` or the default location, or None if disabled."""
+    if path is False:
+        return None
+    try:
+        return GeoCache(path or DEFAULT_PATH)
+    except (OSError, sqlite3.Error) as error:
+        logger.warning("Persistent geocode cache unavailable: %s", error)
+        return None
+
+
+def cached(service):
+    """Decorate a Converter geocoding method with the persistent store.
+
+    Expects the already-normalized address, so equivalent spellings of
+    the same address share one entry. Only successful lookups are
+    stored, so transient failures are retried on the next run.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, address):
+            cache = getattr(self, "_geocache", None)
+            if cache is not None:
+                result = cache.get(service, address)
+                if result is not None:
+                    return result
+            result = func(self, address)
+            if cache is not None and result and result.get("location"):
+                cache.set(service, address, result)
+            return result
+        return wrapper
+    return decorator
@@ -1,8 +1,15 @@
+import math
 import numpy as np
 from typing import Dict, Tuple
 
-def radians(deg):
-    return deg * np.pi / 180
+try:
+    from . import _kernels
+except ImportError: # numba is an optional dependency
+    _kernels = None
+
+# Plain float constant: multiplying by this keeps scalar degree-to-radian
+# conversion in Python floats instead of boxing numpy scalars.
+DEG2RAD = math.pi / 180
 
 def pair_euclid_distance(source: Tuple[float, float], dest: Tuple[float, float]) -> float:
     """Approximate Euclidean distance between given lat/lng coordinates."""
@@ -13,8 +20,8 @@ def pair_euclid_distance(source: Tuple[float, float], dest: Tuple[float, float])
         z = R * np.sin(lat)
         return (x, y, z)
 
-    lat1, lng1 = map(radians, source)
-    lat2, lng2 = map(radians, dest)
+    lat1, lng1 = (value * DEG2RAD for value in source)
+    lat2, lng2 = (value * DEG2RAD for value in dest)
 
     R = 6378137 # Approximate radius of the earth
 
@@ -24,7 +31,27 @@ def pair_euclid_distance(source: Tuple[float, float], dest: Tuple[float, float])
     return distance
 
 
+def cartesian(location: Dict[str, float]) -> Tuple[float, float, float]:
+    """Cartesian triple for a lat/lng dict.
+
+    Cached per point by the converter as `_xyz` so repeated distance
+    calls against the same point skip the trig entirely.
+    """
+    lat = location["lat"] * DEG2RAD
+    lng = location["lng"] * DEG2RAD
+    R = 6378137 # Approximate radius of the earth
+    cos_lat = math.cos(lat)
+    return (R * cos_lat * math.cos(lng), R * cos_lat * math.sin(lng), R * math.sin(lat))
+
+
 def distance(source: Dict[str, float], dest: Dict[str, float]) -> float:
+    s_xyz, d_xyz = source.get("_xyz"), dest.get("_xyz")
+    if s_xyz is not None and d_xyz is not None:
+        return math.sqrt(
+            (s_xyz[0] - d_xyz[0])**2
+            + (s_xyz[1] - d_xyz[1])**2
+            + (s_xyz[2] - d_xyz[2])**2
+        )
     s_lat, s_lng = source.get("lat"), source.get("lng")
     d_lat, d_lng = dest.get("lat"), dest.get("lng")
     if None in (s_lat, s_lng, d_lat, d_lng):
@@ -34,42 +61,72 @@ def distance(source: Dict[str, float], dest: Dict[str, float]) -> float:
     return pair_euclid_distance(source_tuple, dest_tuple)
 
 
-def pair_haversine_distance(src: Tuple[float, float], dst: Tuple[float, float]) -> float:
-    """Approximate distance between given lat/lng coordinates."""
+def distance_matrix_haversine(data) -> np.ndarray:
+    """Float32 matrix of pairwise haversine distances from sequence of addresses."""
     # https://en.wikipedia.org/wiki/Haversine_formula
+    locations = [k["location"] for k in data]
+    size = len(locations)
 
-    lat_src, lng_src = map(radians, src)
-    lat_dst, lng_dst = map(radians, dst)
+    lat = np.deg2rad(np.array([loc["lat"] for loc in locations], dtype=np.float32))
+    lng = np.deg2rad(np.array([loc["lng"] for loc in locations], dtype=np.float32))
 
     R = 6378137 # Approximate radius of the earth
 
-    # TODO: Make these calculations work on a matrix level
-    distance = 2 * R * np.arcsin(
-        np.sqrt(
-            np.sin((lat_dst - lat_src) / 2)**2
-            + np.cos(lat_src)
-            * np.cos(lat_dst)
-            * np.sin((lng_dst - lng_src) / 2)**2
-        )
-    )
+    # Allocate the padded result once and compute in-place to avoid N^2 temporaries.
+    # The final row and column of 0s tell the route solver that the end destination can be anywhere.
+    result_matrix = np.zeros((size + 1, size + 1), dtype=np.float32)
+    a = result_matrix[:size, :size]
 
-    return distance
+    np.subtract(lat[:, None], lat[None, :], out=a)
+    np.multiply(a, 0.5, out=a)
+    np.sin(a, out=a)
+    np.square(a, out=a)
+
+    b = np.subtract(lng[:, None], lng[None, :])
+    np.multiply(b, 0.5, out=b)
+    np.sin(b, out=b)
+    np.square(b, out=b)
+    cos_lat = np.cos(lat)
+    np.multiply(b, cos_lat[:, None], out=b)
+    np.multiply(b, cos_lat[None, :], out=b)
+
+    np.add(a, b, out=a)
+    np.sqrt(a, out=a)
+    np.arcsin(a, out=a)
+    np.multiply(a, np.float32(2 * R), out=a)
+    return result_matrix
 
 
 def distance_matrix(data) -> np.ndarray:
     """Matrix of pairwise distances from sequence of addresses."""
+    size = len(data)
+
+    if size < 32 and all("_xyz" in row for row in data):
+        # At typical daily sizes NumPy per-call dispatch and the N^2 array
+        # allocations cost more than the arithmetic; a tight symmetric loop
+        # over the cached Cartesian triples wins for small N.
+        result_matrix = np.zeros((size + 1, size + 1))
+        xyz = [row["_xyz"] for row in data]
+        for i in range(size):
+            x1, y1, z1 = xyz[i]
+            for j in range(i + 1, size):
+                x2, y2, z2 = xyz[j]
+                d = math.sqrt((x1 - x2)**2 + (y1 - y2)**2 + (z1 - z2)**2)
+                result_matrix[i, j] = d
+                result_matrix[j, i] = d
+        return result_matrix
+
+    if _kernels is None:
+        # Same haversine result as the kernel with fewer transcendentals
+        # and half the bandwidth of the old float64 broadcast form.
+        return distance_matrix_haversine(data)
+
     locations = [k["location"] for k in data]
-    size = len(locations)
-    result_matrix = np.zeros((size, size))
-
-    for i, source in enumerate(locations):
-        for j, dest in enumerate(locations):
-            coord1 = source.values()
-            coord2 = dest.values()
-            distance = pair_euclid_distance(coord1, coord2)
-            result_matrix[(i,j)] = distance
-
-    # We add a final row and column of 0s to tell the route solver that the end destination can be anywhere
-    result_matrix = np.concatenate((result_matrix, np.zeros((1, len(result_matrix)))))
-    result_matrix = np.concatenate((result_matrix, np.zeros((len(result_matrix), 1))), axis=1)
-    return result_matrix 
+    lat = np.deg2rad(np.array([loc["lat"] for loc in locations]))
+    lng = np.deg2rad(np.array([loc["lng"] for loc in locations]))
+
+    # Fused parallel kernel: no N^2 temporaries, outer loop across cores.
+    # The final row and column of 0s tell the route solver that the end destination can be anywhere.
+    result_matrix = np.zeros((size + 1, size + 1))
+    _kernels.haversine_matrix(lat, lng, result_matrix[:size, :size])
+    return result_matrix
@@ -1,7 +1,9 @@
 from .convert import Converter
 from . import matrix, solver
 
+import os
 import csv
+import logging
 import argparse
 from pathlib import Path
 
@@ -18,22 +20,22 @@ class Routes(Converter):
         if any(isinstance(column, str) for column in header):
             header = [header] 
         for n, path in enumerate(paths):
-            output += [[f"DRIVER: {assignment.get(n, '')}"]]
+            output.append([f"DRIVER: {assignment.get(n, '')}"])
             output += header
             for i in path:
                 if i == 0:
                     continue
-                output += [[data[i][k] for k in self.csv_keys]]
-            output += [[" "]]
+                output.append([data[i][k] for k in self.csv_keys])
+            output.append([" "])
         return output
 
 
     def write_slips(self, outfile, rows):
         outfile = Path(outfile)
-        with outfile.open(mode="w") as f:
+        # Large buffer plus the C-level writerows avoids a Python write call per row
+        with outfile.open(mode="w", newline="", buffering=1 << 20) as f:
             writer = csv.writer(f)
-            for row in rows:
-                writer.writerow(row)
+            writer.writerows(rows)
 
 
     def get_slips(self, infile, outfile=None):
@@ -49,6 +51,8 @@ class Routes(Converter):
 
 def cli():
     """Command line entrypoint."""
+    # Logging is configured here rather than in the library modules
+    logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
     parser = argparse.ArgumentParser(description="Create routes from input files.")
     parser.add_argument("infile", help="Signup csv input file.")
     parser.add_argument("--config", help="Config file.")